@@ -638,10 +638,11 @@ if generate:
                 columns_to_show = ["Date", "Rainfall", "Tmax", "Tmin", "max_Rh", "min_Rh"]
                 display_df = display_df[[c for c in columns_to_show if c in display_df.columns]]
 
-                def highlight_rainy_days(row):
-                    return ["background-color: #0ea6ff" if row["Rainfall"] > 0 else "" for _ in row]
+                def highlight_rainy_days(df):
+                    rainy = (df["Rainfall"].to_numpy() > 0)[:, None].repeat(df.shape[1], axis=1)
+                    return pd.DataFrame(np.where(rainy, "background-color: #0ea6ff", ""), index=df.index, columns=df.columns)
 
-                st.dataframe(display_df.style.apply(highlight_rainy_days, axis=1), use_container_width=True)
+                st.dataframe(display_df.style.apply(highlight_rainy_days, axis=None), use_container_width=True)
             else:
                 st.info("No daily weather data for selected date range.")
 
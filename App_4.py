@@ -12,6 +12,7 @@ from datetime import datetime, date, timedelta
 import urllib.parse
 import requests
 from io import BytesIO
+import operator
 
 st.set_page_config(page_title="Crop Advisory System", page_icon="🌱", layout="wide")
 
@@ -37,28 +38,23 @@ def parse_if_condition(cond_str):
     checks = []
     for p in parts:
         if p.startswith(">="):
-            v = float(p.replace(">=", "").strip())
-            checks.append(lambda x, v=v: x >= v)
+            checks.append((operator.ge, float(p.replace(">=", "").strip())))
         elif p.startswith("<="):
-            v = float(p.replace("<=", "").strip())
-            checks.append(lambda x, v=v: x <= v)
+            checks.append((operator.le, float(p.replace("<=", "").strip())))
         elif p.startswith(">"):
-            v = float(p.replace(">", "").strip())
-            checks.append(lambda x, v=v: x > v)
+            checks.append((operator.gt, float(p.replace(">", "").strip())))
         elif p.startswith("<"):
-            v = float(p.replace("<", "").strip())
-            checks.append(lambda x, v=v: x < v)
+            checks.append((operator.lt, float(p.replace("<", "").strip())))
         else:
             try:
-                v = float(p)
-                checks.append(lambda x, v=v: x == v)
+                checks.append((operator.eq, float(p)))
             except Exception:
                 pass
 
     def evaluator(x):
         try:
-            for check in checks:
-                if not check(x):
+            for op, v in checks:
+                if not op(x, v):
                     return False
             return True
         except Exception:
@@ -4,6 +4,7 @@ import numpy as np
 from datetime import datetime, date, timedelta
 import requests
 from io import BytesIO
+import operator
 
 st.set_page_config(page_title="Crop Advisory System", page_icon="🌱", layout="wide")
 
@@ -29,28 +30,23 @@ def parse_if_condition(cond_str):
     checks = []
     for p in parts:
         if p.startswith(">="):
-            v = float(p.replace(">=", "").strip())
-            checks.append(lambda x, v=v: x >= v)
+            checks.append((operator.ge, float(p.replace(">=", "").strip())))
         elif p.startswith("<="):
-            v = float(p.replace("<=", "").strip())
-            checks.append(lambda x, v=v: x <= v)
+            checks.append((operator.le, float(p.replace("<=", "").strip())))
         elif p.startswith(">"):
-            v = float(p.replace(">", "").strip())
-            checks.append(lambda x, v=v: x > v)
+            checks.append((operator.gt, float(p.replace(">", "").strip())))
         elif p.startswith("<"):
-            v = float(p.replace("<", "").strip())
-            checks.append(lambda x, v=v: x < v)
+            checks.append((operator.lt, float(p.replace("<", "").strip())))
         else:
             try:
-                v = float(p)
-                checks.append(lambda x, v=v: x == v)
+                checks.append((operator.eq, float(p)))
             except Exception:
                 pass
 
     def evaluator(x):
         try:
-            for check in checks:
-                if not check(x):
+            for op, v in checks:
+                if not op(x, v):
                     return False
             return True
         except Exception:
@@ -133,9 +129,15 @@ def load_data():
     circles = sorted(weather_df["Circle"].dropna().unique().tolist())
     crops = sorted(rules_df["Crop"].dropna().unique().tolist())
 
-    return weather_df, rules_df, sowing_df, districts, talukas, circles, crops
+    if "Taluka" in weather_df.columns:
+        district_to_talukas = weather_df.dropna(subset=["District", "Taluka"]).groupby("District")["Taluka"].unique().apply(sorted).to_dict()
+        taluka_to_circles = weather_df.dropna(subset=["Taluka", "Circle"]).groupby("Taluka")["Circle"].unique().apply(sorted).to_dict()
+    else:
+        district_to_talukas, taluka_to_circles = {}, {}
+
+    return weather_df, rules_df, sowing_df, districts, talukas, circles, crops, district_to_talukas, taluka_to_circles
 
-weather_df, rules_df, sowing_df, districts, talukas, circles, crops = load_data()
+weather_df, rules_df, sowing_df, districts, talukas, circles, crops, district_to_talukas, taluka_to_circles = load_data()
 
 # -----------------------------
 # Metrics & Advisory Functions
@@ -271,9 +273,9 @@ st.write("📍 Select a location and crop, enter **Sowing Date** & **Current Dat
 col1, col2, col3 = st.columns(3)
 with col1:
     district = st.selectbox("District *", [""] + districts)
-    taluka_options = [""] + sorted(weather_df[weather_df["District"] == district]["Taluka"].dropna().unique().tolist()) if district else talukas
+    taluka_options = [""] + district_to_talukas.get(district, []) if district else talukas
     taluka = st.selectbox("Taluka", taluka_options)
-    circle_options = [""] + sorted(weather_df[weather_df["Taluka"] == taluka]["Circle"].dropna().unique().tolist()) if taluka else circles
+    circle_options = [""] + taluka_to_circles.get(taluka, []) if taluka else circles
     circle = st.selectbox("Circle", circle_options)
 
 with col2:
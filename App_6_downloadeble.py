@@ -2,8 +2,11 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import datetime, date, timedelta
-import requests
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+from kernels import fused_means
+from advisory import WEATHER_COLS, fetch, parse_das_range
 
 st.set_page_config(page_title="Crop Advisory System", page_icon="🌱", layout="wide")
 
@@ -29,21 +32,6 @@ def fn_from_date(dt):
 def normalize_fn_string(s):
     return str(s).replace(".", "").strip()
 
-def das_in_range_string(das, das_str):
-    """Check if DAS falls in a given DAS range string."""
-    s = str(das_str).strip()
-    try:
-        if "to" in s:
-            a, b = [int(p.strip()) for p in s.split("to")]
-            return a <= das <= b
-        elif s.endswith("+"):
-            a = int(s.replace("+", "").strip())
-            return das >= a
-        else:
-            return int(s) == das
-    except Exception:
-        return False
-
 # -----------------------------
 # Load data
 # -----------------------------
@@ -53,11 +41,10 @@ def load_data():
     rules_url = "https://github.com/ASHISHSE/App_test/raw/main/rules.xlsx"
     sowing_url = "https://github.com/ASHISHSE/App_test/raw/main/sowing_calendar.xlsx"
 
-    wres = requests.get(weather_url, timeout=10)
-    rres = requests.get(rules_url, timeout=10)
-    sres = requests.get(sowing_url, timeout=10)
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        wres, rres, sres = ex.map(fetch, [weather_url, rules_url, sowing_url])
 
-    weather_df = pd.read_excel(BytesIO(wres.content))
+    weather_df = pd.read_excel(BytesIO(wres.content), usecols=lambda c: c in WEATHER_COLS)
     rules_df = pd.read_excel(BytesIO(rres.content))
     sowing_df = pd.read_excel(BytesIO(sres.content))
 
@@ -84,14 +71,22 @@ def load_data():
     if "Crop" in rules_df.columns:
         rules_df["Crop"] = rules_df["Crop"].astype(str).str.strip()
 
+    # DAS strings parsed once here; the advisory lookup is then a vectorized integer compare
+    das_bounds = [parse_das_range(v) for v in rules_df.get("DAS (Days After Sowing)", [""] * len(rules_df))]
+    rules_df["das_lo"] = np.array([lo for lo, _ in das_bounds], dtype=np.int32)
+    rules_df["das_hi"] = np.array([hi for _, hi in das_bounds], dtype=np.int32)
+
     districts = sorted(sowing_df["District"].dropna().unique().tolist()) if "District" in sowing_df.columns else []
     talukas = sorted(sowing_df["Taluka"].dropna().unique().tolist()) if "Taluka" in sowing_df.columns else []
     circles = sorted(sowing_df["Circle"].dropna().unique().tolist()) if "Circle" in sowing_df.columns else []
     crops = sorted(rules_df["Crop"].dropna().unique().tolist()) if "Crop" in rules_df.columns else []
 
-    return weather_df, rules_df, sowing_df, districts, talukas, circles, crops
+    district_to_talukas = weather_df.dropna(subset=["District", "Taluka"]).groupby("District")["Taluka"].unique().apply(sorted).to_dict()
+    taluka_to_circles = weather_df.dropna(subset=["Taluka", "Circle"]).groupby("Taluka")["Circle"].unique().apply(sorted).to_dict()
 
-weather_df, rules_df, sowing_df, districts, talukas, circles, crops = load_data()
+    return weather_df, rules_df, sowing_df, districts, talukas, circles, crops, district_to_talukas, taluka_to_circles
+
+weather_df, rules_df, sowing_df, districts, talukas, circles, crops, district_to_talukas, taluka_to_circles = load_data()
 
 # -----------------------------
 # Metrics & Advisory Functions
@@ -125,21 +120,23 @@ def calculate_weather_metrics(weather_data, level, name, sowing_date_str, curren
     month_data = df.loc[month_mask]
 
     # Calculate sums and averages
-    rainfall_das = das_data["Rainfall"].fillna(0).sum() if "Rainfall" in das_data else 0
-    rainfall_last_week = week_data["Rainfall"].fillna(0).sum() if "Rainfall" in week_data else 0
-    rainfall_last_month = month_data["Rainfall"].fillna(0).sum() if "Rainfall" in month_data else 0
+    # Series.sum() already skips NaN, so no fillna(0) copy is needed
+    rainfall_das = das_data["Rainfall"].sum() if "Rainfall" in das_data else 0
+    rainfall_last_week = week_data["Rainfall"].sum() if "Rainfall" in week_data else 0
+    rainfall_last_month = month_data["Rainfall"].sum() if "Rainfall" in month_data else 0
 
-    def avg_ignore_zero_and_na(series):
-        if (series is None) or (series.size == 0):
-            return None
-        s = pd.to_numeric(series, errors="coerce").dropna()
-        s = s[s != 0]
-        return float(s.mean()) if not s.empty else None
+    # All zero/NaN-ignoring averages in one compiled pass over the DAS slice
+    avg_cols = [c for c in ["Tmax", "Tmin", "max_Rh", "min_Rh"] if c in das_data]
+    means = dict(zip(avg_cols, fused_means(das_data[avg_cols].to_numpy(dtype=np.float64))))
+
+    def avg_ignore_zero_and_na(col):
+        v = means.get(col, np.nan)
+        return None if np.isnan(v) else float(v)
 
-    tmax_avg = avg_ignore_zero_and_na(das_data["Tmax"]) if "Tmax" in das_data else None
-    tmin_avg = avg_ignore_zero_and_na(das_data["Tmin"]) if "Tmin" in das_data else None
-    max_rh_avg = avg_ignore_zero_and_na(das_data["max_Rh"]) if "max_Rh" in das_data else None
-    min_rh_avg = avg_ignore_zero_and_na(das_data["min_Rh"]) if "min_Rh" in das_data else None
+    tmax_avg = avg_ignore_zero_and_na("Tmax")
+    tmin_avg = avg_ignore_zero_and_na("Tmin")
+    max_rh_avg = avg_ignore_zero_and_na("max_Rh")
+    min_rh_avg = avg_ignore_zero_and_na("min_Rh")
 
     return {
         "rainfall_last_week": rainfall_last_week,
@@ -179,19 +176,17 @@ def get_sowing_comments(sowing_date_str, district, taluka, circle, crop, sowing_
 def get_growth_advisory(crop, das, rainfall_das, rules_df):
     if "Crop" not in rules_df.columns:
         return None
-    candidates = rules_df[rules_df["Crop"] == crop]
+    candidates = rules_df[(rules_df["Crop"] == crop) & (rules_df["das_lo"] <= das) & (das <= rules_df["das_hi"])]
     if candidates.empty:
         return None
 
-    for _, row in candidates.iterrows():
-        if das_in_range_string(das, row.get("DAS (Days After Sowing)", "")):
-            return {
-                "growth_stage": row.get("Growth Stage", "Unknown"),
-                "das": das,
-                "ideal_water": row.get("Ideal Water Required (in mm)", ""),
-                "farmer_advisory": row.get("Farmer Advisory", "")
-            }
-    return None
+    row = candidates.iloc[0]
+    return {
+        "growth_stage": row.get("Growth Stage", "Unknown"),
+        "das": das,
+        "ideal_water": row.get("Ideal Water Required (in mm)", ""),
+        "farmer_advisory": row.get("Farmer Advisory", "")
+    }
 
 # -----------------------------
 # UI
@@ -209,9 +204,9 @@ st.write("📍 Select a location and crop, enter **Sowing Date** & **Current Dat
 col1, col2, col3 = st.columns(3)
 with col1:
     district = st.selectbox("District *", [""] + districts)
-    taluka_options = [""] + sorted(weather_df[weather_df["District"] == district]["Taluka"].dropna().unique().tolist()) if district else talukas
+    taluka_options = [""] + district_to_talukas.get(district, []) if district else talukas
     taluka = st.selectbox("Taluka", taluka_options)
-    circle_options = [""] + sorted(weather_df[weather_df["Taluka"] == taluka]["Circle"].dropna().unique().tolist()) if taluka else circles
+    circle_options = [""] + taluka_to_circles.get(taluka, []) if taluka else circles
     circle = st.selectbox("Circle", circle_options)
 
 with col2:
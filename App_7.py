@@ -1,9 +1,10 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from datetime import datetime, date, timedelta
+from datetime import date, timedelta
 import requests
 from io import BytesIO
+from advisory import parse_das_range
 
 st.set_page_config(page_title="Crop Advisory System", page_icon="🌱", layout="wide")
 
@@ -14,35 +15,24 @@ def fn_from_date(dt):
     month_name = dt.strftime("%B")
     return f"1FN {month_name}" if dt.day <= 15 else f"2FN {month_name}"
 
-def normalize_fn_string(s):
-    return str(s).replace(".", "").strip()
-
-def das_in_range_string(das, das_str):
-    s = str(das_str).strip()
-    try:
-        if "to" in s:
-            a, b = [int(p.strip()) for p in s.split("to")]
-            return a <= das <= b
-        elif s.endswith("+"):
-            a = int(s.replace("+", "").strip())
-            return das >= a
-        else:
-            return int(s) == das
-    except Exception:
-        return False
-
 # -----------------------------
 # Load data
 # -----------------------------
-@st.cache_data
-def load_data():
+# Shared session so the three downloads (and any refetch) reuse one pooled HTTPS connection
+_SESSION = requests.Session()
+_SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+# Frames are shared by reference (cache_resource, no pickle copy per rerun) and treated as read-only downstream;
+# both caches expire daily and hold a single entry so a refreshed upload replaces, not accumulates
+@st.cache_resource(ttl=24 * 3600, max_entries=1)
+def _load_frames():
     weather_url = "https://github.com/ASHISHSE/App_test/raw/main/weather.xlsx"
     rules_url = "https://github.com/ASHISHSE/App_test/raw/main/rules.xlsx"
     sowing_url = "https://github.com/ASHISHSE/App_test/raw/main/sowing_calendar.xlsx"
 
-    wres = requests.get(weather_url, timeout=10)
-    rres = requests.get(rules_url, timeout=10)
-    sres = requests.get(sowing_url, timeout=10)
+    wres = _SESSION.get(weather_url, timeout=10)
+    rres = _SESSION.get(rules_url, timeout=10)
+    sres = _SESSION.get(sowing_url, timeout=10)
 
     weather_df = pd.read_excel(BytesIO(wres.content))
     rules_df = pd.read_excel(BytesIO(rres.content))
@@ -56,64 +46,104 @@ def load_data():
     else:
         weather_df["Date_dt"] = pd.NaT
 
-    weather_df = weather_df.dropna(subset=["Date_dt"]).copy()
+    # Date-sorted, so any location's rows are date-sorted too and windows are two searchsorted calls
+    weather_df = weather_df.dropna(subset=["Date_dt"]).sort_values("Date_dt", kind="stable", ignore_index=True)
+    weather_df["_date_i64"] = weather_df["Date_dt"].to_numpy(dtype="datetime64[ns]").view("i8")
 
     for col in ["Rainfall", "Tmax", "Tmin", "max_Rh", "min_Rh"]:
         if col in weather_df.columns:
-            weather_df[col] = pd.to_numeric(weather_df[col], errors="coerce")
+            weather_df[col] = pd.to_numeric(weather_df[col], errors="coerce").astype("float32")
+
+    # Location columns are low-cardinality; categorical codes make the per-click equality filter an integer scan
+    for c in ["District", "Taluka", "Circle"]:
+        if c in weather_df.columns:
+            weather_df[c] = weather_df[c].astype("category")
 
     for c in ["District", "Taluka", "Circle", "Crop"]:
         if c in sowing_df.columns:
-            sowing_df[c] = sowing_df[c].astype(str).str.strip()
+            sowing_df[c] = sowing_df[c].astype("string[pyarrow]").str.strip()
+
+    if "Crop" in rules_df.columns:
+        rules_df["Crop"] = rules_df["Crop"].astype("string[pyarrow]").str.strip()
 
+    # Arrow-backed text (missing cells stay <NA>, as in advisory); masks and str.contains run as Arrow kernels
+    sowing_df = sowing_df.astype({c: "string[pyarrow]" for c in ["IF condition", "Comments on Sowing"] if c in sowing_df.columns})
+    rules_df = rules_df.astype({c: "string[pyarrow]" for c in ["Growth Stage", "Farmer Advisory"] if c in rules_df.columns})
+
+    # IF condition with dots removed, stripped and lowercased once, for the vectorized FN match
+    if "IF condition" in sowing_df.columns:
+        sowing_df["_ifcond_norm"] = sowing_df["IF condition"].str.replace(".", "", regex=False).str.strip().str.lower()
+    else:
+        sowing_df["_ifcond_norm"] = pd.Series("", index=sowing_df.index, dtype="string[pyarrow]")
+
+    # Per crop: the DAS ranges parsed once into an IntervalIndex, alongside that crop's usable rule rows
+    rules_by_crop = {}
     if "Crop" in rules_df.columns:
-        rules_df["Crop"] = rules_df["Crop"].astype(str).str.strip()
+        for crop, sub in rules_df.groupby("Crop", sort=False):
+            bounds = [parse_das_range(v) for v in sub.get("DAS (Days After Sowing)", [""] * len(sub))]
+            # Unparseable cells come back as the empty range (1, 0), which an IntervalIndex can't hold
+            keep = [lo <= hi for lo, hi in bounds]
+            bounds = [b for b, k in zip(bounds, keep) if k]
+            rules_by_crop[crop] = (pd.IntervalIndex.from_tuples(bounds, closed="both"), sub[keep])
+
+    return weather_df, rules_df, sowing_df, rules_by_crop
+
+@st.cache_data(ttl=24 * 3600, max_entries=1)
+def load_meta():
+    weather_df, rules_df, sowing_df, _ = _load_frames()
 
     districts = sorted(sowing_df["District"].dropna().unique().tolist()) if "District" in sowing_df.columns else []
     talukas = sorted(sowing_df["Taluka"].dropna().unique().tolist()) if "Taluka" in sowing_df.columns else []
     circles = sorted(sowing_df["Circle"].dropna().unique().tolist()) if "Circle" in sowing_df.columns else []
     crops = sorted(rules_df["Crop"].dropna().unique().tolist()) if "Crop" in rules_df.columns else []
 
-    return weather_df, rules_df, sowing_df, districts, talukas, circles, crops
+    district_to_talukas = weather_df.dropna(subset=["District", "Taluka"]).groupby("District", observed=True)["Taluka"].unique().apply(sorted).to_dict()
+    taluka_to_circles = weather_df.dropna(subset=["Taluka", "Circle"]).groupby("Taluka", observed=True)["Circle"].unique().apply(sorted).to_dict()
 
-weather_df, rules_df, sowing_df, districts, talukas, circles, crops = load_data()
+    return districts, talukas, circles, crops, district_to_talukas, taluka_to_circles
+
+weather_df, rules_df, sowing_df, rules_by_crop = _load_frames()
+districts, talukas, circles, crops, district_to_talukas, taluka_to_circles = load_meta()
 
 # -----------------------------
 # Metrics & Advisory Functions
 # -----------------------------
-def calculate_weather_metrics(weather_data, level, name, sowing_date_str, current_date_str):
-    df = weather_data.copy()
-
-    if level == "Circle":
-        df = df[df["Circle"] == name]
-    elif level == "Taluka":
-        df = df[df["Taluka"] == name]
-    elif level == "District":
-        df = df[df["District"] == name]
-
-    sowing_dt = datetime.strptime(sowing_date_str, "%d/%m/%Y")
-    current_dt = datetime.strptime(current_date_str, "%d/%m/%Y")
+def calculate_weather_metrics(weather_data, level, name, sowing_date, current_date):
+    # The level names are the column names; filter once instead of copying the whole frame first
+    df = weather_data[weather_data[level] == name] if level in ("Circle", "Taluka", "District") else weather_data
+
+    sowing_dt = pd.Timestamp(sowing_date)
+    current_dt = pd.Timestamp(current_date)
     das = max((current_dt - sowing_dt).days, 0)
 
-    das_mask = (df["Date_dt"] >= sowing_dt) & (df["Date_dt"] <= current_dt)
     week_start = current_dt - timedelta(days=6)
     month_start = current_dt - timedelta(days=29)
 
-    week_mask = (df["Date_dt"] >= week_start) & (df["Date_dt"] <= current_dt)
-    month_mask = (df["Date_dt"] >= month_start) & (df["Date_dt"] <= current_dt)
+    # Every window ends on current_dt; rows are date-sorted, so each one is a positional slice
+    dates = df["_date_i64"].to_numpy()
+    hi = np.searchsorted(dates, np.datetime64(current_dt, "ns").view("i8"), side="right")
+
+    def start_of(start):
+        return min(np.searchsorted(dates, np.datetime64(start, "ns").view("i8"), side="left"), hi)
 
-    das_data = df.loc[das_mask]
-    week_data = df.loc[week_mask]
-    month_data = df.loc[month_mask]
+    lo_das, lo_week, lo_month = start_of(sowing_dt), start_of(week_start), start_of(month_start)
+    das_data = df.iloc[lo_das:hi]
+
+    # ✅ Rainfall & Rainy Days: one running sum each, every window is cum[hi] - cum[lo]
+    if "Rainfall" in df:
+        rain = np.nan_to_num(df["Rainfall"].to_numpy(dtype=np.float64))
+        rain_cum = np.concatenate(([0.0], np.cumsum(rain)))
+        rainy_cum = np.concatenate(([0], np.cumsum(rain > 0)))
+    else:
+        rain_cum = rainy_cum = np.zeros(hi + 1)
 
-    rainfall_das = das_data["Rainfall"].fillna(0).sum() if "Rainfall" in das_data else 0
-    rainfall_last_week = week_data["Rainfall"].fillna(0).sum() if "Rainfall" in week_data else 0
-    rainfall_last_month = month_data["Rainfall"].fillna(0).sum() if "Rainfall" in month_data else 0
+    rainfall_das = float(rain_cum[hi] - rain_cum[lo_das])
+    rainfall_last_week = float(rain_cum[hi] - rain_cum[lo_week])
+    rainfall_last_month = float(rain_cum[hi] - rain_cum[lo_month])
 
-    # ✅ Rainy Days Calculation
-    rainy_days_das = (das_data["Rainfall"] > 0).sum() if "Rainfall" in das_data else 0
-    rainy_days_week = (week_data["Rainfall"] > 0).sum() if "Rainfall" in week_data else 0
-    rainy_days_month = (month_data["Rainfall"] > 0).sum() if "Rainfall" in month_data else 0
+    rainy_days_das = int(rainy_cum[hi] - rainy_cum[lo_das])
+    rainy_days_week = int(rainy_cum[hi] - rainy_cum[lo_week])
+    rainy_days_month = int(rainy_cum[hi] - rainy_cum[lo_month])
 
     def avg_ignore_zero_and_na(series):
         if (series is None) or (series.size == 0):
@@ -141,12 +171,10 @@ def calculate_weather_metrics(weather_data, level, name, sowing_date_str, curren
         "das": das,
     }
 
-def get_sowing_comments(sowing_date_str, district, taluka, circle, crop, sowing_df):
+def get_sowing_comments(sowing_date, district, taluka, circle, crop, sowing_df):
     if sowing_df.empty:
         return []
-    sowing_dt = datetime.strptime(sowing_date_str, "%d/%m/%Y")
-    fn = fn_from_date(sowing_dt)
-    results = []
+    fn = fn_from_date(pd.Timestamp(sowing_date)).lower()
 
     filters = [
         (sowing_df["District"] == district) & (sowing_df["Taluka"] == taluka) & (sowing_df["Circle"] == circle) & (sowing_df["Crop"] == crop),
@@ -155,32 +183,31 @@ def get_sowing_comments(sowing_date_str, district, taluka, circle, crop, sowing_
     ]
 
     for f in filters:
-        subset = sowing_df[f]
+        subset = sowing_df[f.fillna(False)]
         if not subset.empty:
-            for _, row in subset.iterrows():
-                cond = normalize_fn_string(row.get("IF condition", ""))
-                if cond and fn.lower() in cond.lower():
-                    results.append(f"{row.get('IF condition','')}: {row.get('Comments on Sowing','')}")
-            if results:
-                break
-    return results
-
-def get_growth_advisory(crop, das, rainfall_das, rules_df):
-    if "Crop" not in rules_df.columns:
-        return None
-    candidates = rules_df[rules_df["Crop"] == crop]
-    if candidates.empty:
+            hits = subset[subset["_ifcond_norm"].str.contains(fn, regex=False, na=False)]
+            if not hits.empty:
+                comments = hits["Comments on Sowing"].astype(str) if "Comments on Sowing" in hits else ""
+                return (hits["IF condition"].astype(str) + ": " + comments).tolist()
+    return []
+
+def get_growth_advisory(crop, das, rainfall_das, rules_by_crop):
+    if crop not in rules_by_crop:
         return None
+    intervals, candidates = rules_by_crop[crop]
 
-    for _, row in candidates.iterrows():
-        if das_in_range_string(das, row.get("DAS (Days After Sowing)", "")):
-            return {
-                "growth_stage": row.get("Growth Stage", "Unknown"),
-                "das": das,
-                "ideal_water": row.get("Ideal Water Required (in mm)", ""),
-                "farmer_advisory": row.get("Farmer Advisory", "")
-            }
-    return None
+    # Adjacent stages share their boundary day ("1 to 50", "50 to 70"), so the intervals overlap and
+    # get_indexer can't be used; the first containing interval keeps the sheet's row order
+    hits = np.flatnonzero(intervals.contains(das))
+    if hits.size == 0:
+        return None
+    row = candidates.iloc[hits[0]]
+    return {
+        "growth_stage": row.get("Growth Stage", "Unknown"),
+        "das": das,
+        "ideal_water": row.get("Ideal Water Required (in mm)", ""),
+        "farmer_advisory": row.get("Farmer Advisory", "")
+    }
 
 # -----------------------------
 # UI
@@ -198,9 +225,9 @@ st.write("📍 Select a location and crop, enter **Sowing Date** & **Current Dat
 col1, col2, col3 = st.columns(3)
 with col1:
     district = st.selectbox("District *", [""] + districts)
-    taluka_options = [""] + sorted(weather_df[weather_df["District"] == district]["Taluka"].dropna().unique().tolist()) if district else talukas
+    taluka_options = [""] + district_to_talukas.get(district, []) if district else talukas
     taluka = st.selectbox("Taluka", taluka_options)
-    circle_options = [""] + sorted(weather_df[weather_df["Taluka"] == taluka]["Circle"].dropna().unique().tolist()) if taluka else circles
+    circle_options = [""] + taluka_to_circles.get(taluka, []) if taluka else circles
     circle = st.selectbox("Circle", circle_options)
 
 with col2:
@@ -213,12 +240,10 @@ if generate:
     if not district or not crop:
         st.error("Please select all required fields.")
     else:
-        sowing_date_str = sowing_date.strftime("%d/%m/%Y")
-        current_date_str = current_date.strftime("%d/%m/%Y")
         level = "Circle" if circle else "Taluka" if taluka else "District"
         level_name = circle if circle else taluka if taluka else district
 
-        metrics = calculate_weather_metrics(weather_df, level, level_name, sowing_date_str, current_date_str)
+        metrics = calculate_weather_metrics(weather_df, level, level_name, sowing_date, current_date)
 
         st.markdown("---")
         st.header("🌤️ Weather Metrics")
@@ -239,7 +264,7 @@ if generate:
 
         st.markdown("---")
         st.header("📝 Comment on Sowing")
-        sowing_comments = get_sowing_comments(sowing_date_str, district, taluka, circle, crop, sowing_df)
+        sowing_comments = get_sowing_comments(sowing_date, district, taluka, circle, crop, sowing_df)
         if sowing_comments:
             for comment in sowing_comments:
                 st.write(f"• {comment}")
@@ -248,7 +273,7 @@ if generate:
 
         st.markdown("---")
         st.header("🌱 Growth Stage Advisory")
-        growth_data = get_growth_advisory(crop, metrics["das"], metrics["rainfall_das"], rules_df)
+        growth_data = get_growth_advisory(crop, metrics["das"], metrics["rainfall_das"], rules_by_crop)
         if growth_data:
             st.write(f"**Growth Stage:** {growth_data['growth_stage']}")
             st.write(f"**DAS:** {growth_data['das']}")
@@ -1,193 +1,27 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import re
-from datetime import datetime, date, timedelta
-import requests
-from io import BytesIO
+from datetime import date, timedelta
+from advisory import load_data, location_key, calculate_weather_metrics, fn_from_date, match_sowing_rows, get_growth_advisory, talukas_for, circles_for, daily_weather_html, daily_weather_table
 
 st.set_page_config(page_title="Crop Advisory System", page_icon="🌱", layout="wide")
 
 # -------------------------
 # Load Data First (avoids NameError)
 # ----------------------------
-@st.cache_data
-def load_data():
-    weather_url = "https://github.com/ASHISHSE/App_test/raw/main/weather.xlsx"
-    rules_url = "https://github.com/ASHISHSE/App_test/raw/main/rules.xlsx"
-    sowing_url = "https://github.com/ASHISHSE/App_test/raw/main/sowing_calendar1.xlsx"
-
-    wres = requests.get(weather_url, timeout=10)
-    rres = requests.get(rules_url, timeout=10)
-    sres = requests.get(sowing_url, timeout=10)
-
-    weather_df = pd.read_excel(BytesIO(wres.content))
-    rules_df = pd.read_excel(BytesIO(rres.content))
-    sowing_df = pd.read_excel(BytesIO(sres.content))
-
-    # ✅ Flexible column detection
-    date_col = None
-    for candidate in ["Date(DD-MM-YYYY)", "DD-MM-YYYY", "Date"]:
-        if candidate in weather_df.columns:
-            date_col = candidate
-            break
-    if date_col is None:
-        raise ValueError("weather.xlsx must have a column named 'Date(DD-MM-YYYY)' or 'DD-MM-YYYY' or 'Date'")
-
-    weather_df["Date_dt"] = pd.to_datetime(weather_df[date_col], format="%d-%m-%Y", errors="coerce")
-    weather_df = weather_df.dropna(subset=["Date_dt"]).copy()
-
-    for col in ["Rainfall", "Tmax", "Tmin", "max_Rh", "min_Rh"]:
-        if col in weather_df.columns:
-            weather_df[col] = pd.to_numeric(weather_df[col], errors="coerce")
-
-    for c in ["District", "Taluka", "Circle", "Crop"]:
-        if c in sowing_df.columns:
-            sowing_df[c] = sowing_df[c].astype(str).str.strip()
-
-    if "Crop" in rules_df.columns:
-        rules_df["Crop"] = rules_df["Crop"].astype(str).str.strip()
-
-    districts = sorted(sowing_df["District"].dropna().unique().tolist()) if "District" in sowing_df.columns else []
-    talukas = sorted(sowing_df["Taluka"].dropna().unique().tolist()) if "Taluka" in sowing_df.columns else []
-    circles = sorted(sowing_df["Circle"].dropna().unique().tolist()) if "Circle" in sowing_df.columns else []
-    crops = sorted(rules_df["Crop"].dropna().unique().tolist()) if "Crop" in rules_df.columns else []
-
-    return weather_df, rules_df, sowing_df, districts, talukas, circles, crops
+SOWING_URL = "https://github.com/ASHISHSE/App_test/raw/main/sowing_calendar1.xlsx"
 
 # ✅ Load data BEFORE any UI or function references
-weather_df, rules_df, sowing_df, districts, talukas, circles, crops = load_data()
-
-# -----------------------------
-# Helper Functions
-# -----------------------------
-def fn_from_date(dt):
-    month_name = dt.strftime("%B")
-    return f"1FN {month_name}" if dt.day <= 15 else f"2FN {month_name}"
-
-def normalize_fn_string(s):
-    return str(s).replace(".", "").strip()
-
-def das_in_range_string(das, das_str):
-    s = str(das_str).strip()
-    try:
-        if "to" in s:
-            a, b = [int(p.strip()) for p in s.split("to")]
-            return a <= das <= b
-        elif s.endswith("+"):
-            a = int(s.replace("+", "").strip())
-            return das >= a
-        else:
-            return int(s) == das
-    except Exception:
-        return False
-
-# -----------------------------
-# Sowing Comment Parser
-# -----------------------------
-def parse_condition_with_dates(cond_str):
-    match = re.search(r"\((\d{2}-\d{2}-\d{4})\s+to\s+(\d{2}-\d{2}-\d{4})\)", cond_str)
-    if match:
-        start = datetime.strptime(match.group(1), "%d-%m-%Y")
-        end = datetime.strptime(match.group(2), "%d-%m-%Y")
-        return start, end
-    return None, None
-
-def match_condition_with_dates(sowing_date, cond_str):
-    start_date, end_date = parse_condition_with_dates(cond_str)
-    if start_date and end_date:
-        return start_date <= sowing_date <= end_date
-    return False
-
-def match_condition(sowing_date, cond_str):
-    cond = normalize_fn_string(cond_str).lower()
-    fn = fn_from_date(sowing_date).lower()
-    return fn in cond  # Fallback match
+weather_df, rules_df, sowing_df, districts, talukas, circles, crops = load_data(SOWING_URL)
 
 # -----------------------------
 # Filtered Sowing Comments (Exact Match + FN Highlight)
 # -----------------------------
-def get_sowing_comments(sowing_date_str, district, taluka, circle, crop, sowing_df):
-    if sowing_df.empty:
+def get_sowing_comments(sowing_dt, district, taluka, circle, crop, sowing_df):
+    hits = match_sowing_rows(sowing_dt, district, taluka, circle, crop, sowing_df)
+    if hits.empty:
         return []
-    sowing_dt = datetime.strptime(sowing_date_str, "%d/%m/%Y")
-    
-    filters = [
-        (sowing_df["District"] == district) & (sowing_df["Taluka"] == taluka) & (sowing_df["Circle"] == circle) & (sowing_df["Crop"] == crop),
-        (sowing_df["District"] == district) & (sowing_df["Taluka"] == taluka) & (sowing_df["Crop"] == crop),
-        (sowing_df["District"] == district) & (sowing_df["Crop"] == crop),
-    ]
-    
-    for f in filters:
-        subset = sowing_df[f]
-        if not subset.empty:
-            for _, row in subset.iterrows():
-                cond = str(row.get("IF condition", "")).strip()
-                if match_condition_with_dates(sowing_dt, cond) or match_condition(sowing_dt, cond):
-                    matched_fn = fn_from_date(sowing_dt)
-                    return [{"matched_fn": matched_fn, "comment": row.get("Comments on Sowing", "")}]
-    return []
-
-# -----------------------------
-# Weather Metrics
-# -----------------------------
-def calculate_weather_metrics(weather_data, level, name, sowing_date_str, current_date_str):
-    df = weather_data.copy()
-    if level == "Circle":
-        df = df[df["Circle"] == name]
-    elif level == "Taluka":
-        df = df[df["Taluka"] == name]
-    elif level == "District":
-        df = df[df["District"] == name]
-
-    sowing_dt = datetime.strptime(sowing_date_str, "%d/%m/%Y")
-    current_dt = datetime.strptime(current_date_str, "%d/%m/%Y")
-    das = max((current_dt - sowing_dt).days, 0)
-
-    das_mask = (df["Date_dt"] >= sowing_dt) & (df["Date_dt"] <= current_dt)
-    week_start = current_dt - timedelta(days=6)
-    month_start = current_dt - timedelta(days=29)
-
-    das_data = df.loc[das_mask]
-    week_data = df.loc[(df["Date_dt"] >= week_start) & (df["Date_dt"] <= current_dt)]
-    month_data = df.loc[(df["Date_dt"] >= month_start) & (df["Date_dt"] <= current_dt)]
-
-    def avg_ignore_zero_and_na(series):
-        s = pd.to_numeric(series, errors="coerce").dropna()
-        s = s[s != 0]
-        return float(s.mean()) if not s.empty else None
-
-    return {
-        "rainfall_das": das_data["Rainfall"].sum() if "Rainfall" in das_data else 0,
-        "rainfall_last_week": week_data["Rainfall"].sum() if "Rainfall" in week_data else 0,
-        "rainfall_last_month": month_data["Rainfall"].sum() if "Rainfall" in month_data else 0,
-        "rainy_days_das": (das_data["Rainfall"] > 0).sum() if "Rainfall" in das_data else 0,
-        "rainy_days_week": (week_data["Rainfall"] > 0).sum() if "Rainfall" in week_data else 0,
-        "rainy_days_month": (month_data["Rainfall"] > 0).sum() if "Rainfall" in month_data else 0,
-        "tmax_avg": avg_ignore_zero_and_na(das_data["Tmax"]) if "Tmax" in das_data else None,
-        "tmin_avg": avg_ignore_zero_and_na(das_data["Tmin"]) if "Tmin" in das_data else None,
-        "max_rh_avg": avg_ignore_zero_and_na(das_data["max_Rh"]) if "max_Rh" in das_data else None,
-        "min_rh_avg": avg_ignore_zero_and_na(das_data["min_Rh"]) if "min_Rh" in das_data else None,
-        "das": das,
-        "das_data": das_data
-    }
-
-# -----------------------------
-# Growth Advisory
-# -----------------------------
-def get_growth_advisory(crop, das, rainfall_das, rules_df):
-    candidates = rules_df[rules_df["Crop"] == crop]
-    if candidates.empty:
-        return None
-    for _, row in candidates.iterrows():
-        if das_in_range_string(das, row.get("DAS (Days After Sowing)", "")):
-            return {
-                "growth_stage": row.get("Growth Stage", "Unknown"),
-                "das": das,
-                "ideal_water": row.get("Ideal Water Required (in mm)", ""),
-                "farmer_advisory": row.get("Farmer Advisory", "")
-            }
-    return None
+    # Only the first matching row is shown, as before
+    return [{"matched_fn": fn_from_date(sowing_dt), "comment": hits.iloc[0].get("Comments on Sowing", "")}]
 
 # -----------------------------
 # UI
@@ -200,9 +34,9 @@ st.write("📍 Select a location and crop, enter **Sowing Date** & **Current Dat
 col1, col2, col3 = st.columns(3)
 with col1:
     district = st.selectbox("District *", [""] + districts)
-    taluka_options = [""] + sorted(weather_df[weather_df["District"] == district]["Taluka"].dropna().unique().tolist()) if district else talukas
+    taluka_options = [""] + list(talukas_for(district)) if district else talukas
     taluka = st.selectbox("Taluka", taluka_options)
-    circle_options = [""] + sorted(weather_df[weather_df["Taluka"] == taluka]["Circle"].dropna().unique().tolist()) if taluka else circles
+    circle_options = [""] + list(circles_for(district, taluka)) if taluka else circles
     circle = st.selectbox("Circle", circle_options)
 
 with col2:
@@ -215,13 +49,8 @@ if generate:
     if not district or not crop:
         st.error("Please select all required fields.")
     else:
-        sowing_date_str = sowing_date.strftime("%d/%m/%Y")
-        current_date_str = current_date.strftime("%d/%m/%Y")
-        level = "Circle" if circle else "Taluka" if taluka else "District"
-        level_name = circle if circle else taluka if taluka else district
-
-        metrics = calculate_weather_metrics(weather_df, level, level_name, sowing_date_str, current_date_str)
-        das_data = metrics["das_data"]
+        sowing_dt, current_dt = pd.Timestamp(sowing_date), pd.Timestamp(current_date)
+        metrics = calculate_weather_metrics(weather_df, location_key(district, taluka, circle), sowing_dt, current_dt)
 
         st.markdown("---")
         st.header("🌤️ Weather Metrics")
@@ -242,22 +71,19 @@ if generate:
 
         st.markdown("---")
         st.header("📅 Daily Weather Data (Highlighted Rainy Days)")
-        if not das_data.empty:
-            display_df = das_data.copy().sort_values("Date_dt")
-            display_df["Date"] = display_df["Date_dt"].dt.strftime("%d-%m-%Y")
-            columns_to_show = ["Date", "Rainfall", "Tmax", "Tmin", "max_Rh", "min_Rh"]
-            display_df = display_df[[col for col in columns_to_show if col in display_df.columns]]
-
-            def highlight_rainy_days(row):
-                return ["background-color: #0ea6ff" if row["Rainfall"] > 0 else "" for _ in row]
-
-            st.dataframe(display_df.style.apply(highlight_rainy_days, axis=1), use_container_width=True)
+        # One circle: its pre-rendered HTML rows; a taluka/district spans many circles, so st.dataframe
+        daily_html = daily_weather_html(district, taluka, circle, sowing_dt, current_dt) if circle else ""
+        daily_table = None if circle else daily_weather_table(district, taluka, circle, sowing_dt, current_dt)
+        if daily_html:
+            st.markdown(daily_html, unsafe_allow_html=True)
+        elif daily_table is not None:
+            st.dataframe(daily_table, use_container_width=True)
         else:
             st.info("No daily weather data for selected date range.")
 
         st.markdown("---")
         st.header("📝 Comment on Sowing")
-        comments = get_sowing_comments(sowing_date_str, district, taluka, circle, crop, sowing_df)
+        comments = get_sowing_comments(sowing_dt, district, taluka, circle, crop, sowing_df)
         if comments:
             for c in comments:
                 st.write(f"**Matched:** {c['matched_fn']}")
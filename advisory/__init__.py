@@ -0,0 +1,32 @@
+"""Shared data loading and advisory logic for the crop advisory apps."""
+from .core import (
+    WEATHER_COLS,
+    fetch,
+    parse_das_range,
+    load_data,
+    fn_from_date,
+    match_sowing_rows,
+    location_key,
+    calculate_weather_metrics,
+    get_growth_advisory,
+    talukas_for,
+    circles_for,
+    daily_weather_html,
+    daily_weather_table,
+)
+
+__all__ = [
+    "WEATHER_COLS",
+    "fetch",
+    "parse_das_range",
+    "load_data",
+    "fn_from_date",
+    "match_sowing_rows",
+    "location_key",
+    "calculate_weather_metrics",
+    "get_growth_advisory",
+    "talukas_for",
+    "circles_for",
+    "daily_weather_html",
+    "daily_weather_table",
+]
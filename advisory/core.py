@@ -0,0 +1,471 @@
+"""Data loading and advisory logic shared by the crop advisory apps.
+
+App_8 and App_9_F are built on it; App_6 reuses the download helpers and DAS parser, App_7 the DAS parser.
+"""
+import streamlit as st
+import pandas as pd
+import numpy as np
+import re
+import os
+import glob
+import tempfile
+import requests
+from io import BytesIO
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from kernels import fused_means
+
+WEATHER_URL = "https://github.com/ASHISHSE/App_test/raw/main/weather.xlsx"
+RULES_URL = "https://github.com/ASHISHSE/App_test/raw/main/rules.xlsx"
+SOWING_URL = "https://github.com/ASHISHSE/App_test/raw/main/sowing_calendar.xlsx"
+
+# -----------------------------
+# DAS Range Parsing
+# -----------------------------
+DAS_OPEN_END = np.iinfo(np.int32).max
+
+def parse_das_range(das_str):
+    """Parse a rules DAS cell ("a to b", "a+" or "a") into an inclusive (lo, hi) pair."""
+    s = str(das_str).strip()
+    try:
+        if "to" in s:
+            a, b = [int(p.strip()) for p in s.split("to")]
+            return a, b
+        elif s.endswith("+"):
+            return int(s.replace("+", "").strip()), DAS_OPEN_END
+        else:
+            return int(s), int(s)
+    except Exception:
+        return 1, 0  # empty range, never matches
+
+# -----------------------------
+# Load Data
+# -----------------------------
+# Only the weather columns used downstream (any of the accepted date headers)
+WEATHER_COLS = {"District", "Taluka", "Circle", "Date(DD-MM-YYYY)", "DD-MM-YYYY", "Date",
+                "Rainfall", "Tmax", "Tmin", "max_Rh", "min_Rh"}
+
+# Explicit "(dd-mm-yyyy to dd-mm-yyyy)" window inside a sowing IF condition
+_RANGE_RE = re.compile(r"\((\d{2}-\d{2}-\d{4})\s+to\s+(\d{2}-\d{2}-\d{4})\)")
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "crop_advisory")
+
+_SESSION = requests.Session()
+# One pooled connection per concurrent download (three loaders plus a spare), kept alive across refetches
+_SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+def fetch(url):
+    return _SESSION.get(url, timeout=10)
+
+def _read_excel(content, **kwargs):
+    # calamine (Rust) parses these workbooks ~4x faster than openpyxl with identical frames
+    try:
+        return pd.read_excel(BytesIO(content), engine="calamine", **kwargs)
+    except ImportError:  # python-calamine not installed
+        return pd.read_excel(BytesIO(content), engine="openpyxl", **kwargs)
+
+def _etag(url):
+    """The remote file's ETag as a file-name-safe token, or None when it can't be had (offline, no header)."""
+    try:
+        etag = _SESSION.head(url, timeout=10, allow_redirects=True).headers.get("ETag", "")
+    except requests.RequestException:
+        return None
+    return re.sub(r"\W", "", etag.removeprefix("W/"))[:32] or None
+
+def _read_parquet(path):
+    """A cached copy, or None after deleting it if it can't be read (e.g. cut short by a killed write)."""
+    try:
+        return pd.read_parquet(path, engine="pyarrow")
+    except Exception:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+def read_excel_cached(url, **kwargs):
+    """Read a workbook from GitHub through a local Parquet copy keyed by its ETag.
+
+    An unchanged file skips both the download and the Excel parsing; a changed one is re-read
+    and replaces the older copies. The copy is keyed by URL and ETag only, so it holds the frame
+    as read with the first caller's kwargs (e.g. usecols): every caller of a URL must pass the same ones.
+    """
+    name = os.path.splitext(os.path.basename(url))[0]
+    cached = sorted(glob.glob(os.path.join(CACHE_DIR, f"{name}-*.parquet")), key=os.path.getmtime)
+    etag = _etag(url)
+    path = os.path.join(CACHE_DIR, f"{name}-{etag}.parquet") if etag else None
+    if path and os.path.exists(path):
+        df = _read_parquet(path)
+        if df is not None:
+            return df
+    if etag is None:
+        for old in reversed(cached):  # can't check for changes: newest readable copy
+            df = _read_parquet(old)
+            if df is not None:
+                return df
+
+    res = fetch(url)
+    df = _read_excel(res.content, **kwargs)
+    # Parquet needs one type per column: turn stray numbers in text columns (e.g. DAS "0") into strings
+    for c in df.columns[df.dtypes == object]:
+        df[c] = df[c].map(lambda v: v if isinstance(v, str) or pd.isna(v) else str(v))
+    if path:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Write under a temp name and rename into place, so a killed process or a second app
+            # starting at the same time never leaves a partial file under the name that gets read
+            fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, prefix=f"{name}-", suffix=".tmp")
+            os.close(fd)
+            try:
+                df.to_parquet(tmp, engine="pyarrow", compression="zstd", index=False)
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            for old in cached:
+                if old != path and os.path.exists(old):
+                    os.remove(old)  # earlier versions of this workbook
+        except Exception:
+            pass  # no writable cache dir: just work from the download
+    return df
+
+# The frames below are built once per process and shared by reference across sessions and across
+# every app that imports this module; st.cache_data would pickle a fresh copy on each rerun.
+# Treat them as read-only. load_data runs them side by side, so they skip the per-function spinner.
+@st.cache_resource(show_spinner=False)
+def load_weather():
+    weather_df = read_excel_cached(WEATHER_URL, usecols=lambda c: c in WEATHER_COLS)
+
+    # ✅ Flexible column detection
+    date_col = None
+    for candidate in ["Date(DD-MM-YYYY)", "DD-MM-YYYY", "Date"]:
+        if candidate in weather_df.columns:
+            date_col = candidate
+            break
+    if date_col is None:
+        raise ValueError("weather.xlsx must have a column named 'Date(DD-MM-YYYY)' or 'DD-MM-YYYY' or 'Date'")
+
+    # Excel/Parquet often hand the column back already typed; only parse strings, with the fixed format
+    if pd.api.types.is_datetime64_any_dtype(weather_df[date_col]):
+        weather_df["Date_dt"] = weather_df[date_col]
+    else:
+        weather_df["Date_dt"] = pd.to_datetime(weather_df[date_col], format="%d-%m-%Y", errors="coerce", cache=True)
+    weather_df = weather_df.dropna(subset=["Date_dt"]).copy()
+
+    for col in ["Rainfall", "Tmax", "Tmin", "max_Rh", "min_Rh"]:
+        if col in weather_df.columns:
+            # float32 is plenty for 0.1 mm / 0.1 °C readings and halves the bytes every scan touches
+            weather_df[col] = pd.to_numeric(weather_df[col], errors="coerce").astype("float32")
+
+    # Low-cardinality labels as categoricals: equality filters compare small integer codes
+    for c in ["District", "Taluka", "Circle"]:
+        if c in weather_df.columns:
+            weather_df[c] = weather_df[c].astype("category")
+
+    # Sorted (District, Taluka, Circle, Date_dt) index: location lookup and date ranges become binary searches.
+    # Levels are left unnamed so the kept columns of the same name stay unambiguous for sort_values/groupby.
+    weather_df = weather_df.set_index(["District", "Taluka", "Circle", "Date_dt"], drop=False).sort_index()
+    weather_df.index.names = [None] * 4
+
+    # Running rainfall total and rainy-day count per circle (loc_id numbers the circles in index order),
+    # so any date window's sums come from two lookups instead of a scan over the window
+    codes = weather_df.index.codes
+    new_loc = np.ones(len(weather_df), dtype=bool)
+    new_loc[1:] = (np.diff(codes[0]) != 0) | (np.diff(codes[1]) != 0) | (np.diff(codes[2]) != 0)
+    weather_df["loc_id"] = (np.cumsum(new_loc) - 1).astype(np.int32)
+    if "Rainfall" in weather_df.columns:
+        weather_df["rain_cs"] = weather_df["Rainfall"].astype("float64").fillna(0).groupby(weather_df["loc_id"]).cumsum()
+        weather_df["rainy_cs"] = (weather_df["Rainfall"] > 0).astype(np.int32).groupby(weather_df["loc_id"]).cumsum()
+    return weather_df
+
+@st.cache_resource(show_spinner=False)
+def load_rules():
+    rules_df = read_excel_cached(RULES_URL)
+
+    if "Crop" in rules_df.columns:
+        rules_df["Crop"] = rules_df["Crop"].astype("string[pyarrow]").str.strip().astype("category")
+
+    # Split the "N to M" DAS strings once so growth-stage lookup is an integer compare
+    das_bounds = [parse_das_range(v) for v in rules_df.get("DAS (Days After Sowing)", [""] * len(rules_df))]
+    rules_df["das_lo"] = np.array([lo for lo, _ in das_bounds], dtype=np.int32)
+    rules_df["das_hi"] = np.array([hi for _, hi in das_bounds], dtype=np.int32)
+    return rules_df
+
+@st.cache_resource(show_spinner=False)
+def load_sowing(sowing_url=SOWING_URL):
+    sowing_df = read_excel_cached(sowing_url)
+
+    # Arrow-backed strings: strip/lower/extract run in Arrow kernels instead of per Python object
+    for c in ["District", "Taluka", "Circle", "Crop"]:
+        if c in sowing_df.columns:
+            sowing_df[c] = sowing_df[c].astype("string[pyarrow]").str.strip().astype("category")
+
+    # Sorted (District, Taluka, Circle, Crop) index so each comment tier is a binary-search lookup;
+    # row_no keeps the sheet order so comments are still listed as written
+    sowing_df["row_no"] = np.arange(len(sowing_df), dtype=np.int32)
+    sowing_keys = ["District", "Taluka", "Circle", "Crop"]
+    if all(c in sowing_df.columns for c in sowing_keys):
+        sowing_df = sowing_df.set_index(sowing_keys, drop=False).sort_index()
+        sowing_df.index.names = [None] * 4
+
+    # Parse each sowing IF condition once: its date window and its normalized FN text
+    conds = sowing_df["IF condition"].astype("string[pyarrow]").str.strip() if "IF condition" in sowing_df.columns else pd.Series("", index=sowing_df.index, dtype="string[pyarrow]")
+    cond_range = conds.str.extract(_RANGE_RE)
+    sowing_df["cond_start"] = pd.to_datetime(cond_range[0], format="%d-%m-%Y", errors="coerce")
+    sowing_df["cond_end"] = pd.to_datetime(cond_range[1], format="%d-%m-%Y", errors="coerce")
+    sowing_df["cond_fn"] = conds.str.replace(".", "", regex=False).str.strip().str.lower().astype("category")
+    return sowing_df
+
+# Cached itself, so reruns return at once and the worker threads only start on a real cold start
+@st.cache_resource(show_spinner="Loading data...")
+def load_data(sowing_url=SOWING_URL):
+    """Weather, rules and the given sowing calendar, plus the dropdown lists (shared; treat as read-only)."""
+    # The three downloads + parses overlap instead of running back to back
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        weather_job = ex.submit(load_weather)
+        rules_job = ex.submit(load_rules)
+        sowing_job = ex.submit(load_sowing, sowing_url)
+        weather_df, rules_df, sowing_df = weather_job.result(), rules_job.result(), sowing_job.result()
+
+    # Categories are already the sorted unique values
+    districts = sowing_df["District"].cat.categories.tolist() if "District" in sowing_df.columns else []
+    talukas = sowing_df["Taluka"].cat.categories.tolist() if "Taluka" in sowing_df.columns else []
+    circles = sowing_df["Circle"].cat.categories.tolist() if "Circle" in sowing_df.columns else []
+    crops = rules_df["Crop"].cat.categories.tolist() if "Crop" in rules_df.columns else []
+
+    return weather_df, rules_df, sowing_df, districts, talukas, circles, crops
+
+# -----------------------------
+# Helper Functions
+# -----------------------------
+def fn_from_date(dt):
+    month_name = dt.strftime("%B")
+    return f"1FN {month_name}" if dt.day <= 15 else f"2FN {month_name}"
+
+# -----------------------------
+# Sowing Comment Matching
+# -----------------------------
+def match_sowing_rows(sowing_dt, district, taluka, circle, crop, sowing_df):
+    """Sowing rows whose IF condition matches sowing_dt, from the narrowest location tier that has any."""
+    if sowing_df.empty:
+        return sowing_df
+
+    # A condition matches on its explicit date window or its fortnight text, both precomputed in load_sowing
+    fn = fn_from_date(sowing_dt).lower()
+    # The FN text check runs once per distinct condition and is broadcast through the category codes
+    cond_fn = sowing_df["cond_fn"].cat
+    fn_hit = np.asarray(cond_fn.categories.str.contains(fn, regex=False), dtype=bool)
+    sd64 = np.datetime64(sowing_dt)
+
+    # Circle -> Taluka -> District; a broader tier is only looked up when the narrower one has no match
+    tiers = [
+        (district, taluka, circle, crop),
+        (district, taluka, slice(None), crop),
+        (district, slice(None), slice(None), crop),
+    ]
+    row_no = sowing_df["row_no"].to_numpy()
+    for key in tiers:
+        try:
+            locs = sowing_df.index.get_locs(key)
+        except KeyError:
+            continue
+        subset = sowing_df.iloc[locs[np.argsort(row_no[locs], kind="stable")]]
+        codes = subset["cond_fn"].cat.codes.to_numpy()
+        in_window = (subset["cond_start"].to_numpy() <= sd64) & (sd64 <= subset["cond_end"].to_numpy())
+        hits = subset[in_window | ((codes >= 0) & fn_hit[codes])]
+        if not hits.empty:
+            return hits
+    return sowing_df.iloc[0:0]
+
+# -----------------------------
+# Weather Lookup
+# -----------------------------
+def location_key(district, taluka, circle):
+    """Index key for the selected level; a circle picked without a taluka matches any taluka."""
+    if circle:
+        return (district, taluka if taluka else slice(None), circle)
+    if taluka:
+        return (district, taluka)
+    return (district,)
+
+def slice_dates(df, start, end):
+    # A single circle is indexed by date alone, so the range is a sorted-index slice
+    if df.index.nlevels == 1:
+        return df.loc[start:end]
+    dates = df["Date_dt"].to_numpy()
+    return df.iloc[np.flatnonzero((dates >= np.datetime64(start)) & (dates <= np.datetime64(end)))]
+
+def rain_window(df, start, end):
+    """Rainfall total and rainy-day count over [start, end] for all locations in a load_weather slice."""
+    if df.empty or "rain_cs" not in df:
+        return 0.0, 0
+    # (loc_id, day) is sorted in the frame, so each location's window is one contiguous run [lo, hi)
+    days = df["Date_dt"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    loc = df["loc_id"].to_numpy().astype(np.int64)
+    key = (loc << 32) + days
+    locs = np.unique(loc)
+    lo = np.searchsorted(key, (locs << 32) + np.datetime64(start, "D").astype(np.int64), side="left")
+    hi = np.searchsorted(key, (locs << 32) + np.datetime64(end, "D").astype(np.int64), side="right")
+    lo, hi = lo[hi > lo], hi[hi > lo]
+    if lo.size == 0:
+        return 0.0, 0
+
+    # Inclusive running sums: run total = cs[hi - 1] - cs[lo] + value[lo]
+    cs = df["rain_cs"].to_numpy()
+    rcs = df["rainy_cs"].to_numpy()
+    first = np.nan_to_num(df["Rainfall"].to_numpy(dtype=np.float64)[lo])
+    total = float(np.sum(cs[hi - 1] - cs[lo] + first))
+    rainy = int(np.sum(rcs[hi - 1] - rcs[lo] + (first > 0)))
+    return total, rainy
+
+# -----------------------------
+# Weather Metrics
+# -----------------------------
+def calculate_weather_metrics(weather_data, loc_key, sowing_dt, current_dt):
+    """Rain totals, rainy days and zero-ignoring averages over the DAS / last week / last month windows."""
+    try:
+        df = weather_data.loc[loc_key]
+    except KeyError:
+        df = weather_data.iloc[0:0]
+
+    das = max((current_dt - sowing_dt).days, 0)
+
+    week_start = current_dt - timedelta(days=6)
+    month_start = current_dt - timedelta(days=29)
+
+    # Only the DAS window is needed as rows (for the averages); the rain sums come from running totals
+    das_data = slice_dates(df, sowing_dt, current_dt)
+
+    rainfall_das, rainy_days_das = rain_window(df, sowing_dt, current_dt)
+    rainfall_last_week, rainy_days_week = rain_window(df, week_start, current_dt)
+    rainfall_last_month, rainy_days_month = rain_window(df, month_start, current_dt)
+
+    avg_cols = [c for c in ["Tmax", "Tmin", "max_Rh", "min_Rh"] if c in das_data]
+    means = dict(zip(avg_cols, fused_means(das_data[avg_cols].to_numpy())))
+
+    def avg_ignore_zero_and_na(col):
+        v = means.get(col, np.nan)
+        return None if np.isnan(v) else float(v)
+
+    return {
+        "rainfall_das": rainfall_das,
+        "rainfall_last_week": rainfall_last_week,
+        "rainfall_last_month": rainfall_last_month,
+        "rainy_days_das": rainy_days_das,
+        "rainy_days_week": rainy_days_week,
+        "rainy_days_month": rainy_days_month,
+        "tmax_avg": avg_ignore_zero_and_na("Tmax"),
+        "tmin_avg": avg_ignore_zero_and_na("Tmin"),
+        "max_rh_avg": avg_ignore_zero_and_na("max_Rh"),
+        "min_rh_avg": avg_ignore_zero_and_na("min_Rh"),
+        "das": das,
+    }
+
+# -----------------------------
+# Daily Weather Table
+# -----------------------------
+DAILY_COLUMNS = ["Date", "Rainfall", "Tmax", "Tmin", "max_Rh", "min_Rh"]
+
+RAINY_ROW_CSS = "background-color: #0ea6ff;"
+
+def style_table(df):
+    # Styles for the whole frame from one np.where broadcast instead of a Python callback per row
+    rainy = df["Rainfall"].to_numpy() > 0
+    css = np.where(rainy[:, None].repeat(df.shape[1], axis=1), RAINY_ROW_CSS, "").astype(object)
+    css[rainy, df.columns.get_loc("Rainfall")] = RAINY_ROW_CSS + " font-weight: bold;"
+    return pd.DataFrame(css, index=df.index, columns=df.columns)
+
+def daily_weather_table(district, taluka, circle, sowing_dt, current_dt):
+    """Styled daily rows since sowing for st.dataframe (None if empty).
+
+    For taluka/district selections: they span many circles, and st.dataframe only sends the visible rows.
+    """
+    try:
+        df = load_weather().loc[location_key(district, taluka, circle)]
+    except KeyError:
+        return None
+    das_data = slice_dates(df, sowing_dt, current_dt)
+    if das_data.empty:
+        return None
+    display_df = das_data.sort_values("Date_dt", kind="stable").assign(Date=lambda d: d["Date_dt"].dt.strftime("%d-%m-%Y"))
+    display_df = display_df[[col for col in DAILY_COLUMNS if col in display_df.columns]].reset_index(drop=True)
+    styler = display_df.style.apply(style_table, axis=None) if "Rainfall" in display_df else display_df.style
+    return styler.format("{:g}", subset=[col for col in DAILY_COLUMNS[1:] if col in display_df.columns], na_rep="")
+
+# Held by reference (no unpickling per hit) and capped, since each viewed circle adds an entry
+@st.cache_resource(show_spinner=False, max_entries=64)
+def season_rows_html(district, taluka, circle):
+    """The circle's whole season as (sorted datetime64 dates, header HTML, one <tr> per day), or None.
+
+    Rendered once per circle; any sowing/current date pair is then a slice of the rows, not a Styler run.
+    """
+    try:
+        df = load_weather().loc[location_key(district, taluka, circle)]
+    except KeyError:
+        return None
+    df = df.sort_values("Date_dt", kind="stable")
+    columns = [col for col in DAILY_COLUMNS if col == "Date" or col in df.columns]
+
+    cells = {"Date": df["Date_dt"].dt.strftime("%d-%m-%Y").tolist()}
+    for col in columns[1:]:
+        cells[col] = ["" if v != v else f"{v:g}" for v in df[col].to_numpy()]
+    rainy = df["Rainfall"].to_numpy() > 0 if "Rainfall" in df else np.zeros(len(df), dtype=bool)
+
+    # Rainy days: whole row shaded, Rainfall cell bold
+    rows = []
+    for i, wet in enumerate(rainy):
+        tds = "".join(
+            f"<td style='font-weight: bold;'>{cells[col][i]}</td>" if wet and col == "Rainfall" else f"<td>{cells[col][i]}</td>"
+            for col in columns
+        )
+        rows.append(f"<tr style='{RAINY_ROW_CSS}'>{tds}</tr>" if wet else f"<tr>{tds}</tr>")
+    header = "<thead><tr>" + "".join(f"<th>{col}</th>" for col in columns) + "</tr></thead>"
+    return df["Date_dt"].to_numpy(), header, rows
+
+def daily_weather_html(district, taluka, circle, sowing_dt, current_dt):
+    """HTML of a single circle's daily table since sowing ("" if empty), sliced out of its pre-rendered season."""
+    season = season_rows_html(district, taluka, circle)
+    if season is None:
+        return ""
+    dates, header, rows = season
+    lo = np.searchsorted(dates, np.datetime64(sowing_dt), side="left")
+    hi = np.searchsorted(dates, np.datetime64(current_dt), side="right")
+    if lo >= hi:
+        return ""
+    body = "".join(rows[lo:hi])
+    return f"<div style='max-height: 420px; overflow-y: auto;'><table>{header}<tbody>{body}</tbody></table></div>"
+
+# -----------------------------
+# Growth Advisory
+# -----------------------------
+def get_growth_advisory(crop, das, rainfall_das, rules_df):
+    candidates = rules_df[(rules_df["Crop"] == crop) & (rules_df["das_lo"] <= das) & (das <= rules_df["das_hi"])]
+    if candidates.empty:
+        return None
+    row = candidates.iloc[0]
+    return {
+        "growth_stage": row.get("Growth Stage", "Unknown"),
+        "das": das,
+        "ideal_water": row.get("Ideal Water Required (in mm)", ""),
+        "farmer_advisory": row.get("Farmer Advisory", "")
+    }
+
+# -----------------------------
+# Dropdown Options (cached per parent selection)
+# -----------------------------
+@st.cache_data
+def talukas_for(district):
+    try:
+        sub = load_weather().loc[(district,), "Taluka"]
+    except KeyError:
+        return ()
+    return tuple(sub.cat.remove_unused_categories().cat.categories)
+
+@st.cache_data
+def circles_for(district, taluka):
+    try:
+        sub = load_weather().loc[(district, taluka), "Circle"]
+    except KeyError:
+        return ()
+    return tuple(sub.cat.remove_unused_categories().cat.categories)
@@ -0,0 +1,36 @@
+"""
+Numba-compiled numeric kernels shared by the Streamlit apps.
+
+They live in their own module so Streamlit's script reloads don't invalidate
+the compiled code, and ``cache=True`` keeps it on disk between restarts.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba not installed: run the same code as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+# FMA/reassociation only; NaN semantics are kept because the kernels test x == x
+_FASTMATH = {"reassoc", "contract", "arcp"}
+
+
+@njit(cache=True, fastmath=_FASTMATH, boundscheck=False)
+def fused_means(arr):
+    """Column means of a 2-D float array, ignoring zeros and NaN (NaN if nothing is left)."""
+    n_rows, n_cols = arr.shape
+    out = np.full(n_cols, np.nan)
+    for j in range(n_cols):
+        s = 0.0
+        n = 0
+        for i in range(n_rows):
+            x = arr[i, j]
+            if x == x and x != 0.0:
+                s += x
+                n += 1
+        if n:
+            out[j] = s / n
+    return out